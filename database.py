@@ -1,17 +1,35 @@
 import os
-from pymongo import MongoClient, ASCENDING
+import pymongo
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
 import logging
 import sys # Import sys module for exiting
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Startup par game_states se sirf ye fields laayi jaati hain (games.rebuild_game_from_dict inhi ko padhta hai)
+GAME_STATE_FIELDS = [
+    "game_type", "group_id", "question", "answer", "players", "current_player_index", "status",
+    "join_window_end_time", "last_activity_time", "turn_timeout", "last_word_played", "guessed_letters"
+]
+
+# get_user_stats / get_leaderboard DB error par ye lautate hain, taaki "koi data nahi" (None / []) se alag pehchana ja sake
+# aur caller fail hue read ko cache na kare
+READ_FAILED = object()
+
+# Handlers jin reads ka jawab ka intezaar karte hain, unka per-operation timeout (seconds)
+READ_TIMEOUT = 5
+# Maujooda collection par index build lamba chal sakta hai, use chhote timeout mein na kaatein
+INDEX_BUILD_TIMEOUT = 600
+
 class MongoDB:
-    def __init__(self):
+    def __init__(self, auto_connect=True):
         self.client = None
         self.db = None
         self.connected = False
-        self.connect()
+        if auto_connect: # False ho to caller baad mein khud connect() call karega
+            self.connect()
 
     def connect(self):
         """
@@ -25,13 +43,29 @@ class MongoDB:
             return
 
         try:
-            self.client = MongoClient(mongo_uri)
+            # Poore bot ke liye ek hi client; handlers asyncio.to_thread se isi pool ke connections share karte hain.
+            # w=1: game state memory se dobara ban sakti hai, isliye majority replication ka intezaar nahi.
+            # serverSelectionTimeoutMS: DB na mile to startup 30s ki jagah 3s mein fail ho.
+            self.client = MongoClient(
+                mongo_uri,
+                maxPoolSize=50, # to_thread ke default executor (max 32 threads) se kam na ho
+                minPoolSize=2,
+                w=1,
+                retryWrites=True,
+                serverSelectionTimeoutMS=3000,
+                # Atki hui query worker thread ko hamesha ke liye na rok le. Ye client-wide hai, isliye bulk writes
+                # aur pruning ke liye kaafi bada; handler reads apna chhota READ_TIMEOUT pymongo.timeout() se lete hain.
+                socketTimeoutMS=30000,
+                # Wire compression: zstd (pymongo[zstd]) na mile to driver use chhodkar zlib par aa jaata hai
+                compressors="zstd,zlib"
+            )
             # Connection ko test karne ke liye admin database ko ping karein.
             self.client.admin.command('ping') 
             self.db = self.client.get_database("telegram_games_db") # Apne database ka naam yahan define karein
             self.connected = True
             logger.info("MongoDB connected successfully!")
             self._ensure_indexes()
+            self._backfill_chats()
             
             # --- CRITICAL DEBUGGING CODE START ---
             # यह कोड ब्लॉक हटा दिया गया है क्योंकि यह अनावश्यक रूप से TypeError को ट्रिगर कर रहा था
@@ -43,6 +77,13 @@ class MongoDB:
             logger.error(f"Could not connect to MongoDB: {e}")
             self.connected = False # Connection fail hone par False set karein
 
+    def close(self):
+        """MongoDB client aur uske connection pool ko band karta hai."""
+        if self.client is not None:
+            self.client.close()
+            logger.info("MongoDB connection closed.")
+        self.connected = False
+
     def _ensure_indexes(self):
         """
         Zaroori collections ke liye indexes banata hai.
@@ -50,20 +91,30 @@ class MongoDB:
         """
         if self.connected and self.db is not None: # `self.db is not None` check यहाँ जोड़ा गया है
             try:
-                # 'game_states' collection ke liye index
-                self.db.game_states.create_index([("group_id", ASCENDING)], unique=True, name="group_id_idx")
-                logger.info("Index created for game_states.group_id")
-
-                # 'user_stats' collection ke liye index
-                self.db.user_stats.create_index([("user_id", ASCENDING)], unique=True, name="user_id_idx")
-                logger.info("Index created for user_stats.user_id")
-
-                # 'game_content' collection ke liye indexes
-                # 'game_message_id' par unique index takki duplicate na ho
-                self.db.game_content.create_index([("game_message_id", ASCENDING)], unique=True, name="game_message_id_idx")
-                # 'created_at' par index takki sabse purani entries ko delete kar saken
-                self.db.game_content.create_index([("created_at", ASCENDING)], name="created_at_idx")
-                logger.info("Indexes created for game_content collection.")
+                with pymongo.timeout(INDEX_BUILD_TIMEOUT):
+                    # 'game_states' collection ke liye index
+                    self.db.game_states.create_index([("group_id", ASCENDING)], unique=True, name="group_id_idx")
+                    logger.info("Index created for game_states.group_id")
+
+                    # 'user_stats' collection ke liye index
+                    self.db.user_stats.create_index([("user_id", ASCENDING)], unique=True, name="user_id_idx")
+                    logger.info("Index created for user_stats.user_id")
+                    # Leaderboard sort ke liye, taaki top N index se hi mil jaaye (collection scan + in-memory sort nahi)
+                    self.db.user_stats.create_index([("total_score", DESCENDING)], name="total_score_idx")
+                    logger.info("Index created for user_stats.total_score")
+
+                    # 'game_content' collection ke liye indexes
+                    # 'game_message_id' par unique index takki duplicate na ho
+                    self.db.game_content.create_index([("game_message_id", ASCENDING)], unique=True, name="game_message_id_idx")
+                    # 'created_at' par index takki sabse purani entries ko delete kar saken
+                    self.db.game_content.create_index([("created_at", ASCENDING)], name="created_at_idx")
+                    # get_random_game_contents ka $match {game_type} poori collection scan na kare
+                    self.db.game_content.create_index([("game_type", ASCENDING), ("created_at", DESCENDING)], name="game_type_created_at_idx")
+                    logger.info("Indexes created for game_content collection.")
+
+                    # 'chats' collection: jin groups mein bot ne game chalaya, broadcast ke liye
+                    self.db.chats.create_index([("chat_id", ASCENDING)], unique=True, name="chat_id_idx")
+                    logger.info("Index created for chats.chat_id")
             except Exception as e:
                 # Agar index creation mein error aaye, to bhi MongoDB connection ko active rakhein,
                 # kyuki initial connection successful raha hai.
@@ -72,6 +123,22 @@ class MongoDB:
             logger.warning("Cannot ensure indexes: MongoDB not connected or self.db is None.")
 
 
+    def _backfill_chats(self):
+        """
+        chats collection baad mein aayi, isliye jin groups ke games game_states mein saved hain unhe bhi register karta hai.
+        $setOnInsert: jo chat pehle se hai (inactive bhi) use nahi chheda jaata.
+        """
+        try:
+            group_ids = self.db.game_states.distinct("group_id")
+            if group_ids:
+                self.db.chats.bulk_write(
+                    [UpdateOne({"chat_id": gid}, {"$setOnInsert": {"active": True}}, upsert=True) for gid in group_ids],
+                    ordered=False
+                )
+                logger.info(f"Backfilled chats collection from {len(group_ids)} saved game states.")
+        except Exception as e:
+            logger.error(f"Error backfilling chats collection: {e}")
+
     def get_collection(self, collection_name):
         """
         Diye gaye naam se MongoDB collection return karta hai, agar database connected hai.
@@ -82,33 +149,48 @@ class MongoDB:
         return None
 
     # --- Game State Management ---
-    def save_game_state(self, game_data):
-        """Game state ko database mein save ya update karta hai."""
+    def bulk_save_game_states(self, game_datas, game_deltas=()):
+        """
+        Kai games ki state ek hi bulk_write round-trip mein save karta hai.
+        game_datas: poore documents (get_game_data_for_db), upsert hote hain
+        game_deltas: [(game_id, get_game_state_delta())], pehle se saved games par sirf $set
+        Jin games ka save fail hua unke game IDs ka set return karta hai (khali set = sab save ho gaye).
+        """
+        ops = [ReplaceOne({"_id": data["_id"]}, data, upsert=True) for data in game_datas]
+        ops.extend(UpdateOne({"_id": game_id}, {"$set": delta}) for game_id, delta in game_deltas)
+        # ops ke index se game ID, taaki BulkWriteError mein sirf fail hue games pehchane ja sakein
+        game_ids = [data["_id"] for data in game_datas] + [game_id for game_id, _ in game_deltas]
+        if not ops:
+            return set()
         if self.connected:
             game_states = self.get_collection("game_states")
-            if game_states is None: return False
+            if game_states is None: return set(game_ids)
             try:
-                game_states.replace_one(
-                    {"_id": game_data["_id"]},
-                    game_data,
-                    upsert=True
-                )
-                logger.info(f"Game state for {game_data['_id']} saved/updated.")
-                return True
+                game_states.bulk_write(ops, ordered=False)
+                logger.info(f"Game states saved/updated for {len(ops)} games.")
+                return set()
+            except BulkWriteError as e:
+                # ordered=False: baaki ops save ho chuke hain, sirf writeErrors wale fail hue
+                failed = {game_ids[err["index"]] for err in e.details.get("writeErrors", [])}
+                if e.details.get("writeConcernErrors"):
+                    failed = set(game_ids) # Write concern pura nahi hua, kisi bhi op par bharosa nahi
+                logger.error(f"Error bulk saving game states ({len(failed)}/{len(ops)} failed): {e.details.get('writeErrors')}")
+                return failed
             except Exception as e:
-                logger.error(f"Error saving game state for {game_data['_id']}: {e}")
-        return False
+                logger.error(f"Error bulk saving game states: {e}")
+        return set(game_ids)
 
-    def get_game_state(self, game_id):
-        """Diye gaye game ID se game state retrieve karta hai."""
+    def get_all_game_states(self):
+        """Startup par sabhi saved game states ek list mein return karta hai."""
         if self.connected:
             game_states = self.get_collection("game_states")
-            if game_states is None: return None
+            if game_states is None: return []
             try:
-                return game_states.find_one({"_id": game_id})
+                # Sirf wahi fields jo rebuild_game_from_dict padhta hai; bade batches se kam round-trips
+                return list(game_states.find({}, projection=GAME_STATE_FIELDS).batch_size(500))
             except Exception as e:
-                logger.error(f"Error getting game state for {game_id}: {e}")
-        return None
+                logger.error(f"Error getting game states: {e}")
+        return []
 
     def delete_game_state(self, game_id):
         """Diye gaye game ID se game state delete karta hai."""
@@ -127,45 +209,60 @@ class MongoDB:
         return False
     
     # --- User Stats Management ---
-    def update_user_stats(self, user_id, username, stats_update):
-        """User ke stats ko update karta hai."""
+    def bulk_update_user_stats(self, updates):
+        """
+        Kai users ke stats ek hi bulk_write round-trip mein update karta hai.
+        updates: [(user_id, username, stats_update), ...]
+        """
         if self.connected:
             user_stats = self.get_collection("user_stats")
             if user_stats is None: return False
+            if not updates: return True
             try:
-                user_stats.update_one(
-                    {"user_id": user_id},
-                    {"$set": {"username": username}, "$inc": stats_update},
-                    upsert=True
-                )
-                logger.info(f"User stats for {user_id} ({username}) updated.")
+                ops = [
+                    UpdateOne(
+                        {"user_id": user_id},
+                        {"$set": {"username": username}, "$inc": stats_update},
+                        upsert=True
+                    )
+                    for user_id, username, stats_update in updates
+                ]
+                user_stats.bulk_write(ops, ordered=False)
+                logger.info(f"User stats for {len(ops)} users updated in bulk.")
                 return True
             except Exception as e:
-                logger.error(f"Error updating user stats for {user_id}: {e}")
+                logger.error(f"Error bulk updating user stats: {e}")
         return False
 
     def get_user_stats(self, user_id):
-        """Diye gaye user ID se user stats retrieve karta hai."""
+        """Diye gaye user ID se user stats retrieve karta hai (user na mile to None, DB error par READ_FAILED)."""
         if self.connected:
             user_stats = self.get_collection("user_stats")
-            if user_stats is None: return None
+            if user_stats is None: return READ_FAILED
             try:
-                return user_stats.find_one({"user_id": user_id})
+                with pymongo.timeout(READ_TIMEOUT):
+                    return user_stats.find_one({"user_id": user_id})
             except Exception as e:
                 logger.error(f"Error getting user stats for {user_id}: {e}")
-        return None
+        return READ_FAILED
 
     def get_leaderboard(self, limit=10, worldwide=True):
-        """Top players ka leaderboard retrieve karta hai."""
+        """Top players ka leaderboard retrieve karta hai (DB error par READ_FAILED)."""
         if self.connected:
             user_stats = self.get_collection("user_stats")
-            if user_stats is None: return []
+            if user_stats is None: return READ_FAILED
             try:
-                leaderboard = list(user_stats.find().sort("total_score", -1).limit(limit))
+                # Sirf wahi fields laayein jo leaderboard message mein dikhte hain
+                with pymongo.timeout(READ_TIMEOUT):
+                    leaderboard = list(
+                        user_stats.find({}, projection={"username": 1, "total_score": 1, "games_won": 1, "_id": 0})
+                        .sort("total_score", DESCENDING)
+                        .limit(limit)
+                    )
                 return leaderboard
             except Exception as e:
                 logger.error(f"Error getting leaderboard: {e}")
-        return []
+        return READ_FAILED
 
     # --- Game Content Management ---
     def add_game_content(self, game_data):
@@ -186,29 +283,41 @@ class MongoDB:
                 return False
         return False
 
-    def get_random_game_message_id(self, game_type):
-        """Random game content item ka Telegram message ID retrieve karta hai."""
+    def get_random_game_contents(self, game_type, count):
+        """
+        Diye gaye game type ke `count` tak random game content documents (question, answer, game_message_id) ek hi query mein return karta hai.
+        """
         if self.connected:
             game_content_col = self.get_collection("game_content")
-            if game_content_col is None: return None
-            # Aggregation pipeline to get a random document
+            if game_content_col is None: return []
+            # Aggregation pipeline to get random documents
             pipeline = [
                 {"$match": {"game_type": game_type}},
-                {"$sample": {"size": 1}}
+                {"$sample": {"size": count}},
+                {"$project": {"_id": 0, "question": 1, "answer": 1, "game_message_id": 1}}
             ]
-            result = list(game_content_col.aggregate(pipeline))
+            try:
+                with pymongo.timeout(READ_TIMEOUT):
+                    result = list(game_content_col.aggregate(pipeline))
+            except Exception as e:
+                logger.error(f"Error fetching random game content for type {game_type}: {e}")
+                return []
             if result:
-                logger.info(f"Fetched random game message ID for type {game_type}")
-                return result[0].get("game_message_id")
+                logger.info(f"Fetched {len(result)} random game content entries for type {game_type}")
+                return result
             logger.warning(f"No game content found in DB for type: {game_type}")
-        return None
+        return []
 
     def get_game_content_count(self):
         """'game_content' collection mein documents ki sankhya return karta hai."""
         if self.connected:
             game_content_col = self.get_collection("game_content")
             if game_content_col is None: return 0
-            return game_content_col.estimated_document_count()
+            try:
+                with pymongo.timeout(READ_TIMEOUT):
+                    return game_content_col.estimated_document_count()
+            except Exception as e:
+                logger.error(f"Error counting game content: {e}")
         return 0
 
     def delete_oldest_game_content(self, count_to_delete):
@@ -220,7 +329,9 @@ class MongoDB:
             game_content_col = self.get_collection("game_content")
             if game_content_col is None: return []
             try:
-                oldest_entries = list(game_content_col.find().sort("created_at", ASCENDING).limit(count_to_delete))
+                oldest_entries = list(game_content_col.find(
+                    {}, projection={"_id": 1, "game_message_id": 1}
+                ).sort("created_at", ASCENDING).limit(count_to_delete))
                 
                 if oldest_entries:
                     delete_ids = [entry["_id"] for entry in oldest_entries]
@@ -234,3 +345,39 @@ class MongoDB:
                 logger.error(f"Error deleting oldest game content: {e}")
                 return []
         return []
+
+    # --- Chat Management (broadcast ke liye) ---
+    def register_chat(self, chat_id):
+        """Group ko chats collection mein active mark karta hai (upsert)."""
+        if self.connected:
+            chats = self.get_collection("chats")
+            if chats is None: return False
+            try:
+                chats.update_one({"chat_id": chat_id}, {"$set": {"active": True}}, upsert=True)
+                return True
+            except Exception as e:
+                logger.error(f"Error registering chat {chat_id}: {e}")
+        return False
+
+    def get_active_chat_ids(self):
+        """Broadcast ke liye sabhi active chat IDs return karta hai."""
+        if self.connected:
+            chats = self.get_collection("chats")
+            if chats is None: return []
+            try:
+                return [doc["chat_id"] for doc in chats.find({"active": True}, projection={"chat_id": 1, "_id": 0})]
+            except Exception as e:
+                logger.error(f"Error getting active chats: {e}")
+        return []
+
+    def mark_chats_inactive(self, chat_ids):
+        """Jin chats mein bot ab message nahi bhej sakta unhe ek hi query mein inactive mark karta hai."""
+        if self.connected and chat_ids:
+            chats = self.get_collection("chats")
+            if chats is None: return False
+            try:
+                chats.update_many({"chat_id": {"$in": list(chat_ids)}}, {"$set": {"active": False}})
+                return True
+            except Exception as e:
+                logger.error(f"Error marking chats inactive: {e}")
+        return False
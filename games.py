@@ -1,26 +1,51 @@
 import random
 import asyncio
+import html
+import re
+import time
+
+# Answers compare karne se pehle extra whitespace hata dete hain; regex ek hi baar compile hota hai
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_answer(text):
+    return _WHITESPACE_RE.sub(" ", text).strip().upper()
 
 # BaseGame class, jahan common game logic hoga
 class BaseGame:
+    # Attributes fixed hain, isliye har game instance par __dict__ ki jagah slots
+    __slots__ = (
+        "game_id", "group_id", "question", "question_html", "answer", "answer_normalized", "game_type",
+        "players", "current_player_index", "status", "join_window_end_time",
+        "last_activity_time", "turn_timeout", "lock", "join_alert_job", "turn_job", "saved_to_db", "last_alert_tier"
+    )
+
     def __init__(self, game_id, group_id, question, answer, game_type="base"):
         self.game_id = game_id
         self.group_id = group_id
         self.question = question
+        self.question_html = html.escape(question) # HTML messages ke liye ek hi baar escape
         self.answer = answer.upper()
+        self.answer_normalized = normalize_answer(answer) # Har message par answer dobara normalize na karna pade
         self.game_type = game_type
         self.players = []
         self.current_player_index = 0
         self.status = "waiting_for_players"
-        self.join_window_end_time = asyncio.get_event_loop().time() + 60
-        self.last_activity_time = asyncio.get_event_loop().time()
+        now = time.monotonic()
+        self.join_window_end_time = now + 60
+        self.last_activity_time = now
         self.turn_timeout = 30
+        self.lock = asyncio.Lock() # Is game ke updates ko ek-ek karke process karne ke liye
+        self.join_alert_job = None # Scheduled Job handles, taaki naam se job_queue scan na karna pade
+        self.turn_job = None
+        self.saved_to_db = False # Pehla poora save ho gaya ho to aage sirf badli hui fields bheji jaati hain
+        self.last_alert_tier = None # Join window ka kaunsa alert tier bheja ja chuka hai
 
     def add_player(self, user_id, username):
         if not any(player['id'] == user_id for player in self.players):
             self.players.append({
                 "id": user_id,
                 "username": username,
+                "safe_name": html.escape(username), # HTML messages ke liye join par hi escape karein
                 "score": 0,
                 "turn_order": len(self.players)
             })
@@ -37,10 +62,25 @@ class BaseGame:
             self.current_player_index = (self.current_player_index + 1) % len(self.players)
 
     def is_answer_correct(self, user_answer):
-        return user_answer.upper() == self.answer
+        return normalize_answer(user_answer) == self.answer_normalized
+
+    def on_correct_answer(self, user_answer):
+        # Sahi jawab ke baad game-specific state update (WordChain pichhla shabd yaad rakhta hai)
+        pass
+
+    def is_solved(self):
+        # Sahi jawab ke baad game khatm ho jaaye ya nahi; sirf GuessingGame poora shabd khulne par khatm hota hai
+        return False
+
+    # Per-turn messages HTML parse_mode mein jaate hain, isliye text escape karke dete hain
+    def question_prompt(self):
+        return f"Sawal: {self.question_html}"
+
+    def next_turn_prompt(self):
+        return f"Agli baari <b>{self.get_current_player()['safe_name']}</b> ki hai.\n{self.question_prompt()}"
 
     def get_initial_message(self):
-        remaining_time = int(self.join_window_end_time - asyncio.get_event_loop().time())
+        remaining_time = int(self.join_window_end_time - time.monotonic())
         if remaining_time < 0: remaining_time = 0
 
         return f"Naya **{self.game_type} Game** shuru ho raha hai!\n\n" \
@@ -49,19 +89,29 @@ class BaseGame:
                f"Aapke paas **{remaining_time} seconds** hain join karne ke liye!"
 
     def get_game_data_for_db(self):
-        # Yahan par WordChain aur Guessing specific attributes bhi shamil karein
+        # Poora document: game banne par (ya pichhla save fail hone par) upsert ke liye
+        # time.monotonic() values restart ke baad bekaar hain, isliye DB mein wall-clock (epoch) time save karein
+        clock_offset = time.time() - time.monotonic()
         data = {
             "_id": self.game_id,
             "group_id": self.group_id,
             "game_type": self.game_type,
             "question": self.question,
             "answer": self.answer,
+            "join_window_end_time": self.join_window_end_time + clock_offset,
+            "turn_timeout": self.turn_timeout
+        }
+        data.update(self.get_game_state_delta())
+        return data
+
+    def get_game_state_delta(self):
+        # Sirf wahi fields jo game ke dauraan badalti hain; DB mein pehle se saved game par $set ke liye
+        # Yahan par WordChain aur Guessing specific attributes bhi shamil karein
+        data = {
             "players": self.players,
             "current_player_index": self.current_player_index,
             "status": self.status,
-            "join_window_end_time": self.join_window_end_time,
-            "last_activity_time": self.last_activity_time,
-            "turn_timeout": self.turn_timeout
+            "last_activity_time": self.last_activity_time + (time.time() - time.monotonic())
         }
         if isinstance(self, WordChainGame):
             data["last_word_played"] = self.last_word_played
@@ -71,24 +121,22 @@ class BaseGame:
 
 # WordChainGame class
 class WordChainGame(BaseGame):
+    __slots__ = ("last_word_played",)
+
     def __init__(self, game_id, group_id, question, answer):
         super().__init__(game_id, group_id, question, answer, "wordchain")
         self.last_word_played = None
 
     def is_answer_correct(self, user_answer):
-        user_answer_upper = user_answer.upper()
-        
-        if not super().is_answer_correct(user_answer):
+        # Pehle sirf pehla akshar check karein (normalize_answer jaisa hi: leading whitespace hata kar upper);
+        # chain se na judne wale messages par poora regex normalize na chale
+        if self.last_word_played and user_answer.lstrip()[:1].upper() != self.last_word_played[-1]:
             return False
+        return super().is_answer_correct(user_answer)
 
-        if self.last_word_played:
-            if not user_answer_upper.startswith(self.last_word_played[-1]):
-                return False
-        
-        return True
-
-    def update_last_word(self, word):
-        self.last_word_played = word.upper()
+    def on_correct_answer(self, user_answer):
+        # Sahi jawab normalize hokar answer_normalized ke barabar tha, isliye dobara normalize karne ki zaroorat nahi
+        self.last_word_played = self.answer_normalized
 
     def get_initial_message(self):
         base_msg = super().get_initial_message()
@@ -96,34 +144,41 @@ class WordChainGame(BaseGame):
 
 # GuessingGame class
 class GuessingGame(BaseGame):
+    __slots__ = ("guessed_letters", "answer_letters", "display_word_template", "prompt_cache")
+
     def __init__(self, game_id, group_id, question, answer):
         super().__init__(game_id, group_id, question, answer, "guessing")
         self.guessed_letters = set()
+        self.answer_letters = set(self.answer) - {" "} # Letter guess ke liye O(1) membership check
         self.display_word_template = "_ " * len(self.answer)
+        # (kitne letters khule the, question_prompt); guessed_letters sirf badhta hai, isliye count badalne par hi rebuild
+        self.prompt_cache = (-1, "")
 
     def is_answer_correct(self, user_answer):
-        user_answer_upper = user_answer.upper()
+        user_answer_upper = normalize_answer(user_answer)
         
-        if user_answer_upper == self.answer:
+        if user_answer_upper == self.answer_normalized:
+            self.guessed_letters.update(self.answer_letters) # Poora shabd guess hua, saare letters khul gaye
             return True
         
         if len(user_answer_upper) == 1 and user_answer_upper.isalpha():
-            if user_answer_upper in self.answer and user_answer_upper not in self.guessed_letters:
+            if user_answer_upper in self.answer_letters and user_answer_upper not in self.guessed_letters:
                 self.guessed_letters.add(user_answer_upper)
                 return True
         return False
 
+    def question_prompt(self):
+        revealed = len(self.guessed_letters)
+        if self.prompt_cache[0] != revealed:
+            self.prompt_cache = (revealed, f"{super().question_prompt()} (Current: <code>{html.escape(self.get_display_word())}</code>)")
+        return self.prompt_cache[1]
+
+    def is_solved(self):
+        return self.answer_letters <= self.guessed_letters
+
     def get_display_word(self):
-        displayed = ""
-        for char in self.answer:
-            if char in self.guessed_letters:
-                displayed += char
-            elif char == " ":
-                displayed += " "
-            else:
-                displayed += "_"
-            displayed += " "
-        return displayed.strip()
+        guessed = self.guessed_letters
+        return " ".join(char if char in guessed or char == " " else "_" for char in self.answer).strip()
 
     def get_initial_message(self):
         base_msg = super().get_initial_message()
@@ -132,6 +187,8 @@ class GuessingGame(BaseGame):
 
 # WordCorrectionGame class
 class WordCorrectionGame(BaseGame):
+    __slots__ = ()
+
     def __init__(self, game_id, group_id, question, answer):
         super().__init__(game_id, group_id, question, answer, "wordcorrection")
 
@@ -150,3 +207,36 @@ def create_game(game_type, game_id, group_id, question, answer):
     else:
         return None
 
+# DB document se game wapas banata hai (restart ke baad active_games ko dobara bharne ke liye)
+def rebuild_game_from_dict(game_data):
+    game = create_game(
+        game_data["game_type"],
+        game_data["_id"],
+        game_data["group_id"],
+        game_data["question"],
+        game_data["answer"]
+    )
+    if game is None:
+        return None
+
+    # DB mein wall-clock time hai, use is process ke time.monotonic() scale par wapas laayein
+    now = time.monotonic()
+    clock_offset = time.time() - now
+    game.players = game_data.get("players", [])
+    for player in game.players:
+        player.setdefault("safe_name", html.escape(player["username"])) # Purane saved games mein ye field nahi thi
+    game.current_player_index = game_data.get("current_player_index", 0)
+    game.status = game_data.get("status", "waiting_for_players")
+    game.join_window_end_time = game_data.get("join_window_end_time", 0) - clock_offset
+    game.last_activity_time = game_data.get("last_activity_time", 0) - clock_offset
+    game.turn_timeout = game_data.get("turn_timeout", 30)
+    # Purani ya galat value future mein na ho, warna timeout kabhi nahi aayega
+    if game.last_activity_time > now:
+        game.last_activity_time = now
+
+    if isinstance(game, WordChainGame):
+        game.last_word_played = game_data.get("last_word_played")
+    elif isinstance(game, GuessingGame):
+        game.guessed_letters = set(game_data.get("guessed_letters", []))
+    game.saved_to_db = True
+    return game
@@ -1,125 +1,400 @@
 import os
+import atexit
 import logging
+import logging.handlers
+import queue
 import asyncio
+import bisect
+import contextlib
+import signal
+import time
 import uuid
 import re
+import html
+import hmac
 from datetime import datetime, timedelta
+from operator import itemgetter
 import random
 
-from flask import Flask
-from threading import Thread
+import uvicorn
+from cachetools import TTLCache
+try:
+    import uvloop # libuv-based event loop; na mile (jaise Windows par) to default asyncio loop chalega
+except ImportError:
+    uvloop = None
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
 
 import telegram
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters, CallbackQueryHandler
+    AIORateLimiter, ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters, CallbackQueryHandler
 )
-from telegram.constants import ParseMode
+from telegram.constants import ChatType, ParseMode
 
-from dotenv import load_dotenv
-
-from database import MongoDB
-from games import create_game, BaseGame, WordChainGame, GuessingGame, WordCorrectionGame
+from database import MongoDB, READ_FAILED
+from games import create_game, rebuild_game_from_dict, BaseGame
 
 # Environment variables load karein
-load_dotenv()
+# Explicit path dene se load_dotenv() ko find_dotenv() ka stack/directory walk nahi karna padta.
+# Production (Koyeb/Docker) mein env vars seedhe milte hain, wahan SKIP_DOTENV=1 set karke parsing skip karein.
+DOTENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.getenv("SKIP_DOTENV") != "1" and os.path.exists(DOTENV_PATH):
+    from dotenv import load_dotenv
+    load_dotenv(DOTENV_PATH)
 
 # --- Configuration ---
+def _env_int(name, default=0):
+    """Env var ko ek hi baar int mein parse karta hai; missing ya galat value par default deta hai."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 MONGO_URI = os.getenv("MONGO_URI")
-GAME_CHANNEL_ID = int(os.getenv("GAME_CHANNEL_ID")) if os.getenv("GAME_CHANNEL_ID") else 0
-LOG_CHANNEL_ID = int(os.getenv("LOG_CHANNEL_ID")) if os.getenv("LOG_CHANNEL_ID") else 0
-OWNER_USER_ID = int(os.getenv("OWNER_USER_ID")) if os.getenv("OWNER_USER_ID") else 0
+GAME_CHANNEL_ID: int = _env_int("GAME_CHANNEL_ID")
+LOG_CHANNEL_ID: int = _env_int("LOG_CHANNEL_ID")
+OWNER_USER_ID: int = _env_int("OWNER_USER_ID")
+
+# Webhook mode: WEBHOOK_URL (public base URL, e.g. https://your-app.koyeb.app) set ho to polling ki jagah webhook use hota hai
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") # Sirf A-Z, a-z, 0-9, _ aur - (1-256 characters)
+WEBHOOK_PATH = "/telegram"
+
+# Bot sirf messages aur button clicks handle karta hai; baaki update types Telegram se mangwane ki zaroorat nahi
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
 
 # Game content storage limits
+CHANNEL_DELETE_CONCURRENCY = 10 # Purane channel posts delete karte waqt ek saath itne API calls
 MAX_GAME_CONTENT_ENTRIES = 1000 # Max entries in game_content collection
 DELETE_PERCENTAGE_ON_FULL = 0.50 # If 100% full, delete this percentage (e.50 means 50%)
 
+# Har turn/join par DB write ki jagah dirty games ko itne seconds mein ek baar flush karein
+DIRTY_FLUSH_INTERVAL = 5
+
+# /leaderboard ka result itne seconds tak memory se serve karein
+LEADERBOARD_CACHE_TTL = 30
+
+# game_content count itne seconds tak memory se use karein
+CONTENT_COUNT_CACHE_TTL = 30
+
+# Bot GAME_CHANNEL_ID mein admin nahi mila to itne seconds tak /addgame channel par post try nahi karega
+CHANNEL_PERM_CACHE_TTL = 60
+
+# /mystats ka result itne seconds tak memory se serve karein; cache itni entries se bada na ho.
+# Game khatm hone par players ki entries turant hata di jaati hain, isliye lamba TTL safe hai.
+USER_STATS_CACHE_TTL = 60
+USER_STATS_CACHE_MAX = 4096
+
+# fetch_game_data ek query mein itne random sawal laakar memory mein rakhta hai.
+# Background job har CONTENT_REFILL_INTERVAL seconds mein CONTENT_POOL_MIN se kam wale pools pehle hi bhar deta hai.
+CONTENT_POOL_SIZE = 20
+CONTENT_POOL_MIN = 5
+CONTENT_REFILL_INTERVAL = 60
+GAME_TYPES = ("wordchain", "guessing", "wordcorrection")
+
+# Har game ke liye ek hi repeating job: join alerts har JOIN_ALERT_INTERVAL seconds,
+# turn timeout check har TURN_CHECK_INTERVAL seconds
+JOIN_ALERT_INTERVAL = 20
+TURN_CHECK_INTERVAL = 5
+
+# Broadcast: ek saath itne sends, aur har send slot ek second mein ek hi baar free hota hai (~25 msg/s, Telegram ki 30 msg/s limit se neeche)
+BROADCAST_CONCURRENCY = 25
+BROADCAST_MAX_RETRIES = 3
+# chats collection sirf game start par bharti hai (startup par saved game_states se backfill), isliye owner ko bata dein
+BROADCAST_AUDIENCE_NOTE = "(Sirf wahi groups jinhone chats tracking shuru hone ke baad game shuru kiya hai.)"
+
+# Log channel messages background queue se jaate hain; queue bhar jaaye to naye messages drop ho jaate hain
+LOG_QUEUE_MAXSIZE = 1000
+LOG_SEND_INTERVAL = 3 # seconds; is beech aaye log messages agle send mein ek saath jaate hain
+TELEGRAM_MESSAGE_LIMIT = 4096 # Ek Telegram message mein max characters
+LOG_DRAIN_TIMEOUT = 5 # Shutdown par bache log messages bhejne ke liye itne seconds
+
 # Logger setup
+# Handlers sirf record ko queue mein daalte hain; formatting aur stdout write ek hi listener thread karta hai
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
     level=logging.INFO
 )
+# Format mein thread/process/source fields use nahi hote, unhe har record par collect na karein.
+# _srcfile = None se findCaller() ka stack walk bhi band ho jata hai.
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging._srcfile = None
+log_listener.start()
+atexit.register(log_listener.stop) # Exit par bache hue records flush karein
 logger = logging.getLogger(__name__)
 
-# Flask App
-app = Flask(__name__)
-
-@app.route('/')
-def health_check():
+# Health Check App (ASGI, bot ke event loop par hi chalta hai)
+async def health_check(request):
     """Koyeb health check ke liye simple endpoint."""
-    return "Bot is running!", 200
+    return PlainTextResponse("Bot is running!")
+
+async def telegram_webhook(request):
+    """
+    Telegram ka update application.update_queue mein daal kar turant 200 return karta hai.
+    Handlers update ko baad mein queue se process karte hain.
+    """
+    # Constant-time comparison, taaki response time se secret ka andaza na lagaya ja sake
+    secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not hmac.compare_digest(secret.encode(), WEBHOOK_SECRET.encode()):
+        return Response(status_code=403)
+    application = request.app.state.application
+    try:
+        data = await request.json()
+        # Update object hi chahiye; [] / "x" / 5 par de_json AttributeError deta hai, {} par None
+        update = Update.de_json(data, application.bot) if isinstance(data, dict) else None
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Rejected malformed webhook update: {e}")
+        return Response(status_code=400)
+    if update is None:
+        logger.warning("Rejected webhook body that is not a Telegram update.")
+        return Response(status_code=400)
+    await application.update_queue.put(update)
+    return Response()
+
+_routes = [Route("/", health_check)]
+if WEBHOOK_URL:
+    _routes.append(Route(WEBHOOK_PATH, telegram_webhook, methods=["POST"]))
+app = Starlette(routes=_routes)
+
+class HealthServer(uvicorn.Server):
+    """Uvicorn server jo SIGINT/SIGTERM khud capture nahi karta; shutdown main() ka stop_event karta hai."""
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
 
 # --- Global Variables ---
-# db_manager ko yahan initialize karein taaki uska connection status check ho sake
-db_manager = MongoDB()
+# db_manager ko yahan initialize karein; connect() __main__ mein env checks ke baad hota hai,
+# taaki galat config par process MongoDB ping/index creation ka intezaar kiye bina turant exit ho.
+# Poore process mein yahi ek instance (aur uska ek MongoClient pool) rahe; kahin aur MongoDB() ya MongoClient() na banayein.
+db_manager = MongoDB(auto_connect=False)
 
 # Active games ko track karne ke liye dictionary: {group_id: game_instance}
 active_games = {}
 
+# Jin groups ki game state badli hai par abhi MongoDB mein save nahi hui: {group_id}
+dirty_games = set()
+
+# Is process mein jo groups chats collection mein active register ho chuke hain: {group_id}
+# Har game start par register_chat ka Mongo round-trip na ho, sirf pehli baar (background mein)
+_registered_chats = set()
+
+# Leaderboard cache: {"global": leaderboard list}; TTL aur eviction TTLCache khud sambhalta hai
+_leaderboard_cache = TTLCache(maxsize=1, ttl=LEADERBOARD_CACHE_TTL)
+
+# User stats cache: {user_id: stats document}; purani entries LRU order mein nikal jaati hain
+_stats_cache = TTLCache(maxsize=USER_STATS_CACHE_MAX, ttl=USER_STATS_CACHE_TTL)
+_CACHE_MISS = object() # Cache miss ko cached None se alag pehchanne ke liye
+
+# game_content ka document count: {"count": int}; /addgame par badhta hai, purani entries delete hone par reset
+_content_count_cache = TTLCache(maxsize=1, ttl=CONTENT_COUNT_CACHE_TTL)
+
+# Channel permission ki pichhli nakaami: {"denied": error text}; TTL ke baad agla /addgame phir try karega
+_channel_perm_cache = TTLCache(maxsize=1, ttl=CHANNEL_PERM_CACHE_TTL)
+
+# Log channel ke liye pending messages (send_log_message daalta hai, _log_channel_worker bhejta hai)
+_log_channel_queue = asyncio.Queue(maxsize=LOG_QUEUE_MAXSIZE)
+
+# Game type -> random game_content documents jo abhi use nahi hue (fetch_game_data inhe pop karta hai)
+_content_pool = {}
+
+# Inline keyboards badalte nahi, isliye ek hi baar banayein
+GAMES_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Wordchain Game", callback_data="start_game_wordchain")],
+    [InlineKeyboardButton("Guessing Game", callback_data="start_game_guessing")],
+    [InlineKeyboardButton("Word Correction Game", callback_data="start_game_wordcorrection")]
+])
+JOIN_KEYBOARD = InlineKeyboardMarkup([[InlineKeyboardButton("Game Join Karein", callback_data="join_game")]])
+
+# /addgame parsing ke regex ek hi baar compile karein
+ADDGAME_PREFIX_RE = re.compile(r'^\s*/addgame(?:@\w+)?\s*', re.IGNORECASE) # "/addgame@BotName" bhi
+GAME_DATA_RE = re.compile(r"/(wordchain|guessing|wordcorrection)\\nque\.\s*(.*?)\\nans\.\s*(.*)", re.DOTALL | re.IGNORECASE)
+
+# Join window alerts: (time_left ki upper limit, message); time_left kis tier mein hai ye bisect se milta hai
+JOIN_ALERT_TIERS = (
+    (20, "<b>{t} seconds remaining! Game starting soon!</b>"),
+    (40, "<b>{t} seconds remaining</b> to join! Last call!"),
+    (60, "<b>{t} seconds remaining</b> to join the game! Use <code>/join</code>"),
+)
+JOIN_ALERT_THRESHOLDS = [threshold for threshold, _ in JOIN_ALERT_TIERS]
+
+# Game ke dauraan baar-baar jaane wale HTML messages; {name} mein player ka pehle se escaped safe_name jaata hai
+JOIN_MSG = "<b>{name}</b> game mein jud gaya hai!"
+ALREADY_JOINED_MSG = "<b>{name}</b>, aap pehle se hi game mein hain."
+CORRECT_MSG = "Sahi jawab, <b>{name}</b>! Aapko 10 points mile hain."
+NOT_YOUR_TURN_MSG = "Abhi <b>{name}</b> ki baari hai."
+TIMEOUT_MSG = "<b>{name}</b>, aapne jawab nahi diya! Aapki baari gayi."
+
+CHANNEL_PERM_MSG = "Bot channel mein admin nahi hai ya channel mein nahi hai. Kripya bot ko channel mein 'Post Messages' aur 'Delete Messages' permissions ke saath admin banayein."
+
+class ActiveGameFilter(filters.MessageFilter):
+    """Sirf un groups ke messages pass karta hai jahan game chal raha hai, taaki baaki groups mein handle_message task hi na bane."""
+    def filter(self, message):
+        game = active_games.get(message.chat_id)
+        return game is not None and game.status == "in_progress"
+
 # --- Helper Functions ---
-async def send_log_message(context: ContextTypes.DEFAULT_TYPE, message: str):
-    """Log channel par messages bhejta hai."""
-    if LOG_CHANNEL_ID:
+_background_tasks = set() # _fire ke tasks ka strong reference, taaki beech mein garbage collect na hon
+
+def _fire(coro):
+    """Coroutine ko background task mein chalata hai (await nahi karta); error aaye to sirf log karta hai."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_task_done)
+    return task
+
+async def _register_chat(chat_id):
+    """Group ko chats collection mein upsert karta hai; fail ho to agle game start par dobara try hoga."""
+    if not await asyncio.to_thread(db_manager.register_chat, chat_id):
+        _registered_chats.discard(chat_id)
+
+def _on_background_task_done(task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background send failed: {task.exception()}")
+
+def send_log_message(message: str):
+    """
+    Log channel message ko queue mein daal deta hai; _log_channel_worker ise background mein bhejta hai.
+    Isse handlers ko log channel ke Telegram round-trip ka intezaar nahi karna padta.
+    """
+    if not LOG_CHANNEL_ID:
+        logger.warning("LOG_CHANNEL_ID not set, skipping log message.")
+        return
+    try:
+        _log_channel_queue.put_nowait(message)
+    except asyncio.QueueFull:
+        logger.warning(f"Log channel queue full, dropping log message: {message}")
+
+async def _log_channel_worker(bot: telegram.Bot):
+    """
+    Queue mein jitne log messages jama hain unhe ek hi message mein jodkar log channel par bhejta hai
+    (Telegram ki 4096 character limit tak), aur har send ke baad LOG_SEND_INTERVAL rukta hai.
+    """
+    carry = None # Pichhle batch mein fit na hua message
+    while True:
+        first = carry if carry is not None else await _log_channel_queue.get()
+        carry = None
+        lines = [first[:TELEGRAM_MESSAGE_LIMIT]]
+        size = len(lines[0])
+        while not _log_channel_queue.empty():
+            message = _log_channel_queue.get_nowait()
+            if size + 1 + len(message) > TELEGRAM_MESSAGE_LIMIT:
+                carry = message
+                break
+            lines.append(message)
+            size += 1 + len(message)
+
+        text = "\n".join(lines)
         try:
-            await context.bot.send_message(chat_id=LOG_CHANNEL_ID, text=message)
+            await bot.send_message(chat_id=LOG_CHANNEL_ID, text=text)
+        except telegram.error.RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            try:
+                await bot.send_message(chat_id=LOG_CHANNEL_ID, text=text)
+            except Exception as e:
+                logger.error(f"Failed to send log message to channel {LOG_CHANNEL_ID}: {e}")
         except Exception as e:
             logger.error(f"Failed to send log message to channel {LOG_CHANNEL_ID}: {e}")
-    else:
-        logger.warning("LOG_CHANNEL_ID not set, skipping log message.")
+        finally:
+            for _ in lines:
+                _log_channel_queue.task_done()
+        await asyncio.sleep(LOG_SEND_INTERVAL)
 
-async def fetch_game_data_from_channel(context: ContextTypes.DEFAULT_TYPE, game_type: str):
+async def flush_dirty_games(context: ContextTypes.DEFAULT_TYPE = None):
     """
-    MongoDB mein store kiye gaye message ID se specific game data ko Telegram channel se fetch karta hai.
+    Dirty games ki latest state MongoDB mein save karta hai.
+    JobQueue se har DIRTY_FLUSH_INTERVAL seconds chalta hai, aur shutdown par ek baar.
     """
-    if not GAME_CHANNEL_ID:
-        logger.error("GAME_CHANNEL_ID not set. Cannot fetch game data from channel.")
-        return None, None
+    if not dirty_games or not db_manager.connected:
+        return
+
+    # Snapshot event loop par hi lein, phir sab games ek hi bulk_write mein save karein
+    games = {}
+    for chat_id in dirty_games:
+        game = active_games.get(chat_id)
+        if game is not None:
+            games[chat_id] = game
+    dirty_games.clear()
+    if not games:
+        return
+
+    # Jo games DB mein pehle se hain unki sirf badli hui fields bhejein; baaki ka poora document upsert karein
+    full_docs = []
+    deltas = []
+    for game in games.values():
+        if game.saved_to_db:
+            deltas.append((game.game_id, game.get_game_state_delta()))
+        else:
+            full_docs.append(game.get_game_data_for_db())
 
+    failed_ids = await asyncio.to_thread(db_manager.bulk_save_game_states, full_docs, deltas)
+
+    for chat_id, game in games.items():
+        still_active = active_games.get(chat_id) is game
+        if game.game_id in failed_ids:
+            if still_active:
+                dirty_games.add(chat_id) # Sirf isi game ko agli flush mein dobara try karein
+        else:
+            game.saved_to_db = True
+        if not still_active:
+            # Save ke dauraan game khatm ho gaya; purani state ko DB mein na chhodein
+            await asyncio.to_thread(db_manager.delete_game_state, game.game_id)
+
+async def fetch_game_data(game_type: str):
+    """
+    MongoDB ke game_content se diye gaye type ka random sawal-jawab laata hai.
+    Har game start par DB query na ho, isliye random sawal _content_pool se aate hain aur pool khali hone par hi refill hota hai.
+    /addgame question aur answer ko channel post ke saath DB mein bhi save karta hai,
+    isliye channel message ko Telegram se dobara fetch karne ki zarurat nahi padti.
+    """
     if not db_manager.connected: # Add this check here as well
         logger.error("MongoDB not connected. Cannot fetch game data.")
         return None, None
 
-    try:
-        # MongoDB se random game message ID prapt karein
-        message_id_to_fetch = db_manager.get_random_game_message_id(game_type)
-        if not message_id_to_fetch:
-            logger.warning(f"No game content found in DB for type: {game_type}. Please add game content using /addgame.")
-            return None, None
-
-        # Telegram Bot API ka upyog karke message ko fetch karein
-        # Context.bot ka upyog kiya gaya hai
-        message = await context.bot.get_message(chat_id=GAME_CHANNEL_ID, message_id=message_id_to_fetch)
-
-        if message and message.text:
-            # Game data format: /gametype\nque. [question]\nans. [answer]
-            # Regular expression to match the format
-            match = re.search(r"/(wordchain|guessing|wordcorrection)\nque\.\s*(.*?)\nans\.\s*(.*)", message.text, re.DOTALL | re.IGNORECASE)
-            
-            if match and match.group(1).lower() == game_type:
-                question = match.group(2).strip()
-                answer = match.group(3).strip()
-                logger.info(f"Fetched game data from channel (via ID {message_id_to_fetch}): Type={game_type}, Q={question}, A={answer}")
-                return question, answer
-            else:
-                logger.error(f"Message ID {message_id_to_fetch} se parsed data invalid format mein: {message.text[:50]}...")
-                return None, None
-        else:
-            logger.error(f"Message ID {message_id_to_fetch} channel {GAME_CHANNEL_ID} mein nahi mila ya khali hai.")
-            return None, None
-
-    except telegram.error.BadRequest as e:
-        if "message not found" in str(e).lower():
-            logger.warning(f"Message ID {message_id_to_fetch} channel {GAME_CHANNEL_ID} mein nahi mila. Shayad delete ho gaya.")
-        elif "bot is not a member of the channel" in str(e).lower() or "not an administrator" in str(e).lower():
-            logger.error(f"Bot lacks permissions to read messages in channel {GAME_CHANNEL_ID}: {e}. Ensure bot is admin with 'Read messages' permission.")
-        else:
-            logger.error(f"Telegram API error while fetching message {message_id_to_fetch}: {e}")
+    pool = _content_pool.setdefault(game_type, [])
+    if not pool:
+        # Pool khali hai: ek hi $sample query se agle kai games ke sawal le aayein
+        pool.extend(await asyncio.to_thread(db_manager.get_random_game_contents, game_type, CONTENT_POOL_SIZE))
+    content = pool.pop() if pool else None
+    if not content:
+        logger.warning(f"No game content found in DB for type: {game_type}. Please add game content using /addgame.")
         return None, None
-    except Exception as e:
-        logger.error(f"Error fetching game data from channel using stored message ID: {e}")
+
+    question = content.get("question")
+    answer = content.get("answer")
+    if not question or not answer:
+        logger.error(f"Game content (message ID {content.get('game_message_id')}) mein question/answer missing hai.")
         return None, None
 
+    logger.info(f"Fetched game data (message ID {content.get('game_message_id')}): Type={game_type}, Q={question}, A={answer}")
+    return question, answer
+
+async def refill_content_pools(context: ContextTypes.DEFAULT_TYPE = None):
+    """
+    Repeating job: jin game types ka pool khatm hone wala hai unhe DB se pehle hi bhar deta hai,
+    taaki game start par sawal ke liye DB round-trip ka intezaar na karna pade.
+    """
+    if not db_manager.connected:
+        return
+    for game_type in GAME_TYPES:
+        pool = _content_pool.setdefault(game_type, [])
+        if len(pool) < CONTENT_POOL_MIN:
+            contents = await asyncio.to_thread(db_manager.get_random_game_contents, game_type, CONTENT_POOL_SIZE - len(pool))
+            # Await ke dauraan pool clear/replace ho sakta hai (addgame/pruning), isliye current pool mein daalein
+            _content_pool.setdefault(game_type, []).extend(contents)
+
 async def check_and_manage_game_content_storage(context: ContextTypes.DEFAULT_TYPE):
     """
     MongoDB game_content collection mein entries ki sankhya check karta hai.
@@ -130,183 +405,209 @@ async def check_and_manage_game_content_storage(context: ContextTypes.DEFAULT_TY
         logger.error("MongoDB not connected. Skipping game content storage management.")
         return
 
-    current_count = db_manager.get_game_content_count()
+    current_count = _content_count_cache.get("count")
+    if current_count is None:
+        current_count = await asyncio.to_thread(db_manager.get_game_content_count)
+        _content_count_cache["count"] = current_count
     if current_count >= MAX_GAME_CONTENT_ENTRIES:
         count_to_delete = int(MAX_GAME_CONTENT_ENTRIES * DELETE_PERCENTAGE_ON_FULL)
         if count_to_delete == 0: # Ensure at least 1 is deleted if count is small
             count_to_delete = 1
             
         logger.info(f"Game content collection {current_count}/{MAX_GAME_CONTENT_ENTRIES} entries tak pahunch gaya hai. {count_to_delete} oldest entries delete kar raha hu.")
-        await send_log_message(context, f"Game content storage full. Deleting {count_to_delete} oldest entries.")
+        send_log_message(f"Game content storage full. Deleting {count_to_delete} oldest entries.")
 
-        telegram_message_ids_to_delete = db_manager.delete_oldest_game_content(count_to_delete)
+        telegram_message_ids_to_delete = await asyncio.to_thread(db_manager.delete_oldest_game_content, count_to_delete)
+        _content_pool.clear() # Pool mein delete hui entries na rahein
+        _content_count_cache.clear()
         
-        for msg_id in telegram_message_ids_to_delete:
-            try:
-                await context.bot.delete_message(chat_id=GAME_CHANNEL_ID, message_id=msg_id)
-                logger.info(f"Deleted Telegram message ID {msg_id} from channel {GAME_CHANNEL_ID}.")
-            except telegram.error.BadRequest as e:
-                if "message can't be deleted" in str(e).lower() or "message not found" in str(e).lower():
-                    logger.warning(f"Telegram message ID {msg_id} ko delete nahi kar paya (shayad pehle hi delete ho gaya ya admin permission nahi).")
-                else:
-                    logger.error(f"Error deleting Telegram message ID {msg_id} from channel: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error while deleting Telegram message ID {msg_id}: {e}")
-        await send_log_message(context, f"{len(telegram_message_ids_to_delete)} game entries successfully deleted from channel and DB.")
+        semaphore = asyncio.Semaphore(CHANNEL_DELETE_CONCURRENCY)
+
+        async def _delete(msg_id):
+            # Kai deletes ek saath chalte hain; AIORateLimiter unhe Telegram ki limits ke andar rakhta hai
+            async with semaphore:
+                try:
+                    await context.bot.delete_message(chat_id=GAME_CHANNEL_ID, message_id=msg_id)
+                    logger.info(f"Deleted Telegram message ID {msg_id} from channel {GAME_CHANNEL_ID}.")
+                except telegram.error.BadRequest as e:
+                    if "message can't be deleted" in str(e).lower() or "message not found" in str(e).lower():
+                        logger.warning(f"Telegram message ID {msg_id} ko delete nahi kar paya (shayad pehle hi delete ho gaya ya admin permission nahi).")
+                    else:
+                        logger.error(f"Error deleting Telegram message ID {msg_id} from channel: {e}")
+                except Exception as e:
+                    logger.error(f"Unexpected error while deleting Telegram message ID {msg_id}: {e}")
+
+        # dict.fromkeys: duplicate IDs hata dein, order wahi rahe
+        await asyncio.gather(*(_delete(msg_id) for msg_id in dict.fromkeys(telegram_message_ids_to_delete)))
+        send_log_message(f"{len(telegram_message_ids_to_delete)} game entries successfully deleted from channel and DB.")
     else:
         logger.info(f"Game content count: {current_count}/{MAX_GAME_CONTENT_ENTRIES}. No deletion needed.")
 
 
-async def send_game_join_alerts(context: ContextTypes.DEFAULT_TYPE, game: BaseGame):
+async def send_game_join_alerts(context: ContextTypes.DEFAULT_TYPE):
+    """
+    join_alert_{game_id} repeating job ka callback (har JOIN_ALERT_INTERVAL seconds).
+    Join window khatm hone par game shuru ya cancel karta hai aur khud ko remove kar deta hai.
+    """
+    game_id = context.job.data["game_id"]
+    chat_id = context.job.data["chat_id"]
     try:
         # Check if game is still active in active_games to prevent errors for ended games
-        if game.group_id not in active_games or active_games[game.group_id].game_id != game.game_id:
-            logger.info(f"Join alert for game {game.game_id} (group {game.group_id}) skipped, game no longer active.")
+        game = active_games.get(chat_id)
+        if game is None or game.game_id != game_id:
+            logger.info(f"Join alert for game {game_id} (group {chat_id}) skipped, game no longer active.")
+            context.job.schedule_removal()
             return
 
         if game.status != "waiting_for_players":
+            context.job.schedule_removal()
+            game.join_alert_job = None
             return
 
-        current_time = asyncio.get_event_loop().time()
+        current_time = time.monotonic()
         time_left = int(game.join_window_end_time - current_time)
-        chat_id = game.group_id
-
-        if 60 >= time_left > 40:
-            await context.bot.send_message(chat_id=chat_id, text=f"**{time_left} seconds remaining** to join the game! Use `/join`", parse_mode=ParseMode.MARKDOWN)
-        elif 40 >= time_left > 20:
-            await context.bot.send_message(chat_id=chat_id, text=f"**{time_left} seconds remaining** to join! Last call!", parse_mode=ParseMode.MARKDOWN)
-        elif 20 >= time_left > 0:
-            await context.bot.send_message(chat_id=chat_id, text=f"**{time_left} seconds remaining! Game starting soon!**", parse_mode=ParseMode.MARKDOWN)
-        elif time_left <= 0 and game.status == "waiting_for_players":
+
+        if time_left > 0:
+            # Har tier ka alert sirf ek baar jaaye, chahe job ke ticks thoda drift karein
+            tier = bisect.bisect_left(JOIN_ALERT_THRESHOLDS, time_left)
+            if tier < len(JOIN_ALERT_TIERS) and tier != game.last_alert_tier:
+                game.last_alert_tier = tier
+                await context.bot.send_message(chat_id=chat_id, text=JOIN_ALERT_TIERS[tier][1].format(t=time_left), parse_mode=ParseMode.HTML)
+        else:
+            context.job.schedule_removal()
+            game.join_alert_job = None
             if len(game.players) >= 1:
                 game.status = "in_progress"
                 game.last_activity_time = current_time
                 await context.bot.send_message(
                     chat_id=chat_id,
-                    text=f"Time's up! Game **{game.__class__.__name__}** has started with {len(game.players)} players!\n"
-                         f"First turn: **{game.get_current_player()['username']}**\n\n"
-                         f"Sawal: {game.question}" + (f" (Current: `{game.get_display_word()}`)" if isinstance(game, GuessingGame) else ""),
-                    parse_mode=ParseMode.MARKDOWN
+                    text=f"Time's up! Game <b>{game.__class__.__name__}</b> has started with {len(game.players)} players!\n"
+                         f"First turn: <b>{game.get_current_player()['safe_name']}</b>\n\n"
+                         f"{game.question_prompt()}",
+                    parse_mode=ParseMode.HTML
                 )
-                if db_manager.connected: # Save game state only if connected
-                    db_manager.save_game_state(game.get_game_data_for_db())
-                context.job_queue.run_once(
-                    lambda ctx: check_turn_timeout(ctx, game.game_id),
-                    game.turn_timeout,
-                    data={"game_id": game.game_id, "chat_id": chat_id},
-                    name=f"turn_timeout_{game.game_id}"
+                dirty_games.add(chat_id) # Status change agli flush ke saath save hoga
+                game.turn_job = context.job_queue.run_repeating(
+                    check_turn_timeout,
+                    interval=TURN_CHECK_INTERVAL,
+                    first=TURN_CHECK_INTERVAL,
+                    data={"game_id": game_id, "chat_id": chat_id},
+                    name=f"turn_timeout_{game_id}"
                 )
             else:
+                remove_game(chat_id)
                 await context.bot.send_message(chat_id=chat_id, text="Not enough players joined. Game cancelled.")
-                if chat_id in active_games:
-                    del active_games[chat_id]
                 if db_manager.connected: # Delete game state only if connected
-                    db_manager.delete_game_state(game.game_id)
-                await send_log_message(context, f"Game {game.game_id} in group {chat_id} cancelled due to no players.")
-            return
-
-        next_schedule_delay = min(time_left, 20)
-        if next_schedule_delay > 0:
-            context.job_queue.run_once(
-                lambda ctx: send_game_join_alerts(ctx, game),
-                next_schedule_delay,
-                data={"game_id": game.game_id, "chat_id": chat_id},
-                name=f"join_alert_{game.game_id}"
-            )
-        else:
-            context.job_queue.run_once(
-                lambda ctx: send_game_join_alerts(ctx, game),
-                1,
-                data={"game_id": game.game_id, "chat_id": chat_id},
-                name=f"join_alert_{game.game_id}"
-            )
+                    await asyncio.to_thread(db_manager.delete_game_state, game_id)
+                send_log_message(f"Game {game_id} in group {chat_id} cancelled due to no players.")
 
     except Exception as e:
-        logger.error(f"Error in send_game_join_alerts for game {game.game_id}: {e}")
+        logger.error(f"Error in send_game_join_alerts for game {game_id}: {e}")
 
-async def check_turn_timeout(context: ContextTypes.DEFAULT_TYPE, game_id: str):
+async def check_turn_timeout(context: ContextTypes.DEFAULT_TYPE):
+    """
+    turn_timeout_{game_id} repeating job ka callback (har TURN_CHECK_INTERVAL seconds).
+    Current player ne turn_timeout tak jawab nahi diya to baari aage badhata hai.
+    Turns par job ko reschedule nahi karna padta, sirf last_activity_time update hota hai.
+    """
+    game_id = context.job.data["game_id"]
     chat_id = context.job.data["chat_id"]
-    if chat_id in active_games and active_games[chat_id].game_id == game_id:
-        game = active_games[chat_id]
-        if game.status == "in_progress":
-            time_since_last_activity = asyncio.get_event_loop().time() - game.last_activity_time
-            if time_since_last_activity >= game.turn_timeout:
+    game = active_games.get(chat_id)
+    if game is not None and game.game_id == game_id:
+        if game.status == "in_progress" and time.monotonic() - game.last_activity_time >= game.turn_timeout:
+            # Lock sirf tab lein jab timeout hua lage; andar dobara check karein kyunki is beech jawab aa sakta hai
+            async with game.lock:
+                if active_games.get(chat_id) is not game or game.status != "in_progress":
+                    return
+                if time.monotonic() - game.last_activity_time < game.turn_timeout:
+                    return
                 current_player = game.get_current_player()
                 if current_player:
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text=f"**{current_player['username']}**, aapne jawab nahi diya! Aapki baari gayi.",
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    game.next_turn()
-                    game.last_activity_time = asyncio.get_event_loop().time()
-                    if db_manager.connected: # Save game state only if connected
-                        db_manager.save_game_state(game.get_game_data_for_db())
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text=f"Agli baari **{game.get_current_player()['username']}** ki hai.\nSawal: {game.question}" + (f" (Current: `{game.get_display_word()}`)" if isinstance(game, GuessingGame) else ""),
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    for job in context.job_queue.get_jobs_by_name(f"turn_timeout_{game.game_id}"):
-                        job.schedule_removal()
-                    context.job_queue.run_once(
-                        lambda ctx: check_turn_timeout(ctx, game.game_id),
-                        game.turn_timeout,
-                        data={"game_id": game.game_id, "chat_id": chat_id},
-                        name=f"turn_timeout_{game.game_id}"
-                    )
+                    await _advance_turn(context, game, TIMEOUT_MSG.format(name=current_player['safe_name']))
                 else:
                     await context.bot.send_message(chat_id=chat_id, text="Game stuck: No current player found.")
                     await end_game_logic(context, chat_id, "stuck")
-            else:
-                remaining_time = game.turn_timeout - time_since_last_activity
-                if remaining_time > 0:
-                    # JobQueue ko re-schedule karein, thoda zyada samay dekar taaki race condition na ho
-                    context.job_queue.run_once(
-                        lambda ctx: check_turn_timeout(ctx, game.game_id),
-                        remaining_time + 1, # Add 1 second to ensure it runs after the timeout
-                        data={"game_id": game.game_id, "chat_id": chat_id},
-                        name=f"turn_timeout_{game.game_id}"
-                    )
     else:
         logger.info(f"Turn timeout job for game {game_id} cancelled as game no longer active or ID mismatch.")
-        # Ensure job is removed if game is no longer active
-        for job in context.job_queue.get_jobs_by_name(f"turn_timeout_{game_id}"):
+        context.job.schedule_removal()
+
+async def _advance_turn(context: ContextTypes.DEFAULT_TYPE, game: BaseGame, prefix_msg: str, reply_to=None):
+    """
+    Baari agle player ko deta hai aur result (prefix_msg) + agli baari ek hi message mein bhejta hai.
+    reply_to diya ho to us message ka reply karta hai, warna group mein naya message bhejta hai.
+    Har turn par chalta hai, isliye HTML parse_mode (usernames escape karke) use hota hai,
+    taaki username mein _ ya * hone par "can't parse entities" error na aaye.
+    """
+    game.next_turn()
+    game.last_activity_time = time.monotonic()
+    dirty_games.add(game.group_id)
+
+    text = f"{prefix_msg}\n\n{game.next_turn_prompt()}"
+    if reply_to is not None:
+        await reply_to.reply_text(text, parse_mode=ParseMode.HTML)
+    else:
+        await context.bot.send_message(chat_id=game.group_id, text=text, parse_mode=ParseMode.HTML)
+
+def remove_game(chat_id):
+    """
+    Game ko active_games se hatata hai aur uske pending flush aur scheduled jobs turant cancel karta hai.
+    Teardown ka ek hi raasta, taaki koi job khatm hue game par na chale. Hataya gaya game (ya None) return karta hai.
+    """
+    game = active_games.pop(chat_id, None)
+    if game is None:
+        return None
+    dirty_games.discard(chat_id)
+    for job in (game.join_alert_job, game.turn_job):
+        if job is not None and not job.removed:
             job.schedule_removal()
+    game.join_alert_job = None
+    game.turn_job = None
+    return game
 
 async def end_game_logic(context: ContextTypes.DEFAULT_TYPE, chat_id: int, reason: str):
-    if chat_id in active_games:
-        game = active_games[chat_id]
+    # Game ko pehle hi hata dein, taaki do saath chalti end calls (jaise /endgame + sahi jawab) stats do baar update na karein
+    game = remove_game(chat_id)
+    if game is not None:
         game_id = game.game_id
         game_type = game.__class__.__name__
 
-        await context.bot.send_message(chat_id=chat_id, text=f"Game **{game_type}** ({game_id}) khatm ho gaya hai! Reason: {reason}", parse_mode=ParseMode.MARKDOWN)
-
+        stats_updates = []
         if game.players:
-            results_msg = "Game Results:\n"
-            sorted_players = sorted(game.players, key=lambda p: p['score'], reverse=True)
+            results_lines = ["Game Results:"]
+            sorted_players = sorted(game.players, key=itemgetter('score'), reverse=True)
             for i, player in enumerate(sorted_players):
-                if db_manager.connected: # Update stats only if connected
-                    db_manager.update_user_stats(
-                        player['id'],
-                        player['username'],
-                        {"games_played": 1, "games_won": 1 if i == 0 else 0, "total_score": player['score']}
-                    )
-                results_msg += f"{i+1}. {player['username']}: {player['score']} points\n"
-            await context.bot.send_message(chat_id=chat_id, text=results_msg)
+                stats_updates.append((
+                    player['id'],
+                    player['username'],
+                    {"games_played": 1, "games_won": 1 if i == 0 else 0, "total_score": player['score']}
+                ))
+                results_lines.append(f"{i+1}. {player['username']}: {player['score']} points")
+            results_text = "\n".join(results_lines)
         else:
-            await context.bot.send_message(chat_id=chat_id, text="Khel mein koi player nahi tha.")
-
-        if db_manager.connected: # Delete game state only if connected
-            db_manager.delete_game_state(game_id)
-        del active_games[chat_id]
-
-        for job in context.job_queue.get_jobs_by_name(f"join_alert_{game_id}"):
-            job.schedule_removal()
-        for job in context.job_queue.get_jobs_by_name(f"turn_timeout_{game_id}"):
-            job.schedule_removal()
-
-        await send_log_message(context, f"Game {game_id} in group {chat_id} ended. Reason: {reason}")
+            results_text = "Khel mein koi player nahi tha."
+
+        async def _announce():
+            await context.bot.send_message(chat_id=chat_id, text=f"Game **{game_type}** ({game_id}) khatm ho gaya hai! Reason: {reason}", parse_mode=ParseMode.MARKDOWN)
+            await context.bot.send_message(chat_id=chat_id, text=results_text)
+
+        # Game active_games se nikal chuka hai, isliye stats aur game state delete hamesha chalein,
+        # chahe announce fail ho jaaye (bot group se nikala gaya, RetryAfter, ...)
+        pending = [_announce()]
+        if db_manager.connected:
+            if stats_updates:
+                pending.append(asyncio.to_thread(db_manager.bulk_update_user_stats, stats_updates))
+            pending.append(asyncio.to_thread(db_manager.delete_game_state, game_id))
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, BaseException):
+                logger.error(f"Error while ending game {game_id} in group {chat_id}: {result}")
+
+        if stats_updates:
+            # Totals badal gaye, agla /leaderboard aur /mystats DB se fresh laaye
+            _leaderboard_cache.clear()
+            for player in game.players:
+                _stats_cache.pop(player['id'], None)
+
+        send_log_message(f"Game {game_id} in group {chat_id} ended. Reason: {reason}")
     else:
         await context.bot.send_message(chat_id=chat_id, text="Koi active game nahi hai jise khatm kiya ja sake.")
 
@@ -323,16 +624,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "Commands ki list ke liye `/games` type karein."
     )
     await update.message.reply_text(welcome_message, parse_mode=ParseMode.MARKDOWN)
-    await send_log_message(context, f"User {user.id} ({user.username}) started the bot in chat {update.effective_chat.id}.")
+    send_log_message(f"User {user.id} ({user.username}) started the bot in chat {update.effective_chat.id}.")
 
 async def games(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Wordchain Game", callback_data="start_game_wordchain")],
-        [InlineKeyboardButton("Guessing Game", callback_data="start_game_guessing")],
-        [InlineKeyboardButton("Word Correction Game", callback_data="start_game_wordcorrection")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     rules_message = (
         "**Games List & Rules:**\n\n"
         "1.  **Wordchain Game:** Ek shabd se shuru karein. Agla player pichhle shabd ke aakhri akshar se shuru hone wala naya shabd batayega.\n"
@@ -340,7 +634,7 @@ async def games(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "3.  **Word Correction Game:** Galat spelling wale shabd ko sahi karein.\n\n"
         "Kisi bhi game ko shuru karne ke liye niche diye gaye button par click karein."
     )
-    await update.message.reply_text(rules_message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+    await update.message.reply_text(rules_message, reply_markup=GAMES_KEYBOARD, parse_mode=ParseMode.MARKDOWN)
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
@@ -349,7 +643,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     chat_id = query.message.chat_id
     user = query.from_user
 
-    if chat_id < 0: # Group chats ke liye
+    if query.message.chat.type in (ChatType.GROUP, ChatType.SUPERGROUP): # Group chats ke liye
         if query.data.startswith("start_game_"):
             game_type = query.data.replace("start_game_", "")
             await start_new_game(update, context, game_type, chat_id)
@@ -369,11 +663,16 @@ async def start_new_game(update: Update, context: ContextTypes.DEFAULT_TYPE, gam
         logger.error(f"Cannot start new game in group {chat_id}: MongoDB not connected.")
         return
 
-    # Game channel se data fetch karein
-    question, answer = await fetch_game_data_from_channel(context, game_type)
+    # Game content DB se fetch karein
+    question, answer = await fetch_game_data(game_type)
     if not question or not answer:
         await update.effective_message.reply_text("Game data nahi mil paya. Kripya channel mein game data sahi format mein add karein using `/addgame`.")
-        await send_log_message(context, f"Failed to start game {game_type} in group {chat_id}: No data from channel/DB.")
+        send_log_message(f"Failed to start game {game_type} in group {chat_id}: No data from channel/DB.")
+        return
+
+    # Updates ek saath process hote hain: fetch ke dauraan kisi aur ne game shuru kar diya ho to ise chhod dein
+    if chat_id in active_games:
+        await update.effective_message.reply_text("Is group mein pehle se ek game chal raha hai! Use `/endgame` se khatm karein.")
         return
 
     game_id = str(uuid.uuid4())
@@ -381,39 +680,39 @@ async def start_new_game(update: Update, context: ContextTypes.DEFAULT_TYPE, gam
 
     if new_game:
         active_games[chat_id] = new_game
-        db_manager.save_game_state(new_game.get_game_data_for_db())
-
-        join_button = InlineKeyboardButton("Game Join Karein", callback_data="join_game")
-        reply_markup = InlineKeyboardMarkup([[join_button]])
+        dirty_games.add(chat_id) # Poora document agli bulk flush mein jaayega (saved_to_db abhi False hai)
+        if chat_id not in _registered_chats: # Broadcast ke liye group yaad rakhein, reply ka intezaar karwaye bina
+            _registered_chats.add(chat_id)
+            _fire(_register_chat(chat_id))
 
         await update.effective_message.reply_text(
             new_game.get_initial_message(),
-            reply_markup=reply_markup,
+            reply_markup=JOIN_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN
         )
-        await send_log_message(context, f"Game {game_type} ({game_id}) started in group {chat_id}.")
+        send_log_message(f"Game {game_type} ({game_id}) started in group {chat_id}.")
 
-        context.job_queue.run_once(
-            lambda ctx: send_game_join_alerts(ctx, new_game),
-            1,
+        new_game.join_alert_job = context.job_queue.run_repeating(
+            send_game_join_alerts,
+            interval=JOIN_ALERT_INTERVAL,
+            first=1,
             data={"game_id": game_id, "chat_id": chat_id},
             name=f"join_alert_{game_id}"
         )
     else:
         await update.effective_message.reply_text("Invalid game type specified.")
-        await send_log_message(context, f"Invalid game type '{game_type}' requested in group {chat_id}.")
+        send_log_message(f"Invalid game type '{game_type}' requested in group {chat_id}.")
 
 async def join_game(update: Update, context: ContextTypes.DEFAULT_TYPE, user):
     chat_id = update.effective_chat.id
-    if chat_id in active_games:
-        game = active_games[chat_id]
+    game = active_games.get(chat_id)
+    if game is not None:
         if game.status == "waiting_for_players":
             if game.add_player(user.id, user.first_name):
-                await update.effective_message.reply_text(f"**{user.first_name}** game mein jud gaya hai!", parse_mode=ParseMode.MARKDOWN)
-                if db_manager.connected: # Save game state only if connected
-                    db_manager.save_game_state(game.get_game_data_for_db())
+                await update.effective_message.reply_text(JOIN_MSG.format(name=game.players[-1]['safe_name']), parse_mode=ParseMode.HTML)
+                dirty_games.add(chat_id)
             else:
-                await update.effective_message.reply_text(f"**{user.first_name}**, aap pehle se hi game mein hain.", parse_mode=ParseMode.MARKDOWN)
+                await update.effective_message.reply_text(ALREADY_JOINED_MSG.format(name=html.escape(user.first_name)), parse_mode=ParseMode.HTML)
         else:
             await update.effective_message.reply_text("Yeh game abhi join nahi kiya ja sakta ya shuru ho chuka hai.")
     else:
@@ -421,11 +720,22 @@ async def join_game(update: Update, context: ContextTypes.DEFAULT_TYPE, user):
 
 async def endgame(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
-    await end_game_logic(context, chat_id, "Command se khatm kiya gaya")
+    game = active_games.get(chat_id)
+    if game is None:
+        await end_game_logic(context, chat_id, "Command se khatm kiya gaya")
+        return
+    # Chal rahe jawab/timeout ke poora hone ka intezaar karein, phir game khatm karein
+    async with game.lock:
+        await end_game_logic(context, chat_id, "Command se khatm kiya gaya")
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
-    
+
+    # ActiveGameFilter pehle hi check kar chuka hai, par block=False task chalne tak game khatm ho sakta hai
+    game = active_games.get(chat_id)
+    if game is None or game.status != "in_progress":
+        return
+
     if update.effective_user is None:
         logger.warning(f"Message received in chat {chat_id} with no effective user. Ignoring.")
         return
@@ -433,8 +743,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     user_id = update.effective_user.id
     text = update.message.text
 
-    if chat_id in active_games:
-        game = active_games[chat_id]
+    # Ek game ke turns order mein chalein; alag groups ke games ek doosre ka intezaar nahi karte
+    async with game.lock:
+        if active_games.get(chat_id) is not game or game.status != "in_progress":
+            return # Lock ka intezaar karte waqt game khatm ho gaya
 
         # Ensure that the current player is indeed the one sending the message
         current_player = game.get_current_player()
@@ -442,72 +754,32 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             logger.warning(f"No current player found for active game {game.game_id} in chat {chat_id}. Ignoring message from {user_id}.")
             return
 
-        if game.status == "in_progress" and current_player['id'] == user_id:
+        if current_player['id'] == user_id:
             # Check if it's a game-specific command and handle it if needed
             # For example, if you had /hint or /skip commands for in-game
             if text.startswith('/'):
                 logger.info(f"Ignoring command {text} from current player during in-progress game.")
                 return # Ignore commands during game unless they are specific game commands
-            
+        
             if game.is_answer_correct(text):
                 current_player['score'] += 10
-                await update.message.reply_text(f"Sahi jawab, **{current_player['username']}**! Aapko 10 points mile hain.", parse_mode=ParseMode.MARKDOWN)
-                
-                if isinstance(game, GuessingGame) and game.get_display_word().replace(" ", "") == game.answer:
-                    await update.message.reply_text(f"Shabd mil gaya! **{game.answer}**\n\nGame khatm!", parse_mode=ParseMode.MARKDOWN)
+                correct_msg = CORRECT_MSG.format(name=current_player['safe_name'])
+            
+                if game.is_solved():
+                    await update.message.reply_text(f"{correct_msg}\n\nShabd mil gaya! <b>{html.escape(game.answer)}</b>\n\nGame khatm!", parse_mode=ParseMode.HTML)
                     await end_game_logic(context, chat_id, "Sahi jawab")
                     return
-                
-                if isinstance(game, WordChainGame):
-                    game.update_last_word(text)
-
-                game.last_activity_time = asyncio.get_event_loop().time()
-                game.next_turn()
-                if db_manager.connected: # Save game state only if connected
-                    db_manager.save_game_state(game.get_game_data_for_db())
-
-                await update.message.reply_text(
-                    f"Agli baari **{game.get_current_player()['username']}** ki hai.\n"
-                    f"Sawal: {game.question}" + (f" (Current: `{game.get_display_word()}`)" if isinstance(game, GuessingGame) else ""),
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                for job in context.job_queue.get_jobs_by_name(f"turn_timeout_{game.game_id}"):
-                    job.schedule_removal()
-                context.job_queue.run_once(
-                    lambda ctx: check_turn_timeout(ctx, game.game_id),
-                    game.turn_timeout,
-                    data={"game_id": game.game_id, "chat_id": chat_id},
-                    name=f"turn_timeout_{game.game_id}"
-                )
+            
+                game.on_correct_answer(text)
 
+                await _advance_turn(context, game, correct_msg, reply_to=update.message)
             else:
-                await update.message.reply_text("Galat jawab. Koshish karte rahiye!")
-                game.next_turn()
-                game.last_activity_time = asyncio.get_event_loop().time()
-                if db_manager.connected: # Save game state only if connected
-                    db_manager.save_game_state(game.get_game_data_for_db())
-                await update.message.reply_text(
-                    f"Agli baari **{game.get_current_player()['username']}** ki hai.\n"
-                    f"Sawal: {game.question}" + (f" (Current: `{game.get_display_word()}`)" if isinstance(game, GuessingGame) else ""),
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                for job in context.job_queue.get_jobs_by_name(f"turn_timeout_{game.game_id}"):
-                    job.schedule_removal()
-                context.job_queue.run_once(
-                    lambda ctx: check_turn_timeout(ctx, game.game_id),
-                    game.turn_timeout,
-                    data={"game_id": game.game_id, "chat_id": chat_id},
-                    name=f"turn_timeout_{game.game_id}"
-                )
+                await _advance_turn(context, game, "Galat jawab. Koshish karte rahiye!", reply_to=update.message)
 
-        elif game.status == "waiting_for_players":
-            pass # Messages ignored when waiting for players
-        elif game.status == "ended":
-            pass # Messages ignored if game is ended
         else:
             # If it's not the current player's turn, inform them
-            if current_player and current_player['id'] != user_id:
-                await update.message.reply_text(f"Abhi **{current_player['username']}** ki baari hai.", parse_mode=ParseMode.MARKDOWN)
+            # Sirf jaankari wala reply: game.lock ko iske Telegram round-trip tak na rokein
+            _fire(update.message.reply_text(NOT_YOUR_TURN_MSG.format(name=current_player['safe_name']), parse_mode=ParseMode.HTML))
 
 async def my_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if update.effective_user is None:
@@ -523,7 +795,13 @@ async def my_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     username = update.effective_user.first_name
 
-    stats = db_manager.get_user_stats(user_id)
+    stats = _stats_cache.get(user_id, _CACHE_MISS)
+    if stats is _CACHE_MISS:
+        stats = await asyncio.to_thread(db_manager.get_user_stats, user_id)
+        if stats is READ_FAILED: # Error ko cache na karein, warna TTL tak "koi game nahi khela" dikhega
+            await update.message.reply_text("Stats abhi load nahi ho paaye. Thodi der baad dobara try karein.")
+            return
+        _stats_cache[user_id] = stats
     if stats:
         message = (
             f"**{username}'s Stats:**\n"
@@ -542,7 +820,13 @@ async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         logger.error("Cannot retrieve leaderboard: MongoDB not connected.")
         return
 
-    leaderboard_data = db_manager.get_leaderboard(limit=10, worldwide=True)
+    leaderboard_data = _leaderboard_cache.get("global")
+    if leaderboard_data is None:
+        leaderboard_data = await asyncio.to_thread(db_manager.get_leaderboard, limit=10, worldwide=True)
+        if leaderboard_data is READ_FAILED: # Error ko cache na karein, warna TTL tak khali board dikhega
+            await update.message.reply_text("Leaderboard abhi load nahi ho paaya. Thodi der baad dobara try karein.")
+            return
+        _leaderboard_cache["global"] = leaderboard_data
 
     if leaderboard_data:
         message = "**Global Leaderboard (Top 10):**\n"
@@ -567,9 +851,48 @@ async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     broadcast_text = " ".join(context.args)
-    
-    await update.message.reply_text("Broadcast functionality is a placeholder. It needs actual chat_id fetching logic from DB.")
-    await send_log_message(context, f"Owner broadcast attempted: {broadcast_text}")
+
+    if not db_manager.connected:
+        await update.message.reply_text("Database se connect nahi ho paya. Broadcast nahi kar sakte.")
+        logger.error("Cannot broadcast: MongoDB not connected.")
+        return
+
+    chat_ids = await asyncio.to_thread(db_manager.get_active_chat_ids)
+    if not chat_ids:
+        await update.message.reply_text(f"Broadcast ke liye koi active group nahi mila. {BROADCAST_AUDIENCE_NOTE}")
+        return
+
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    inactive_chats = []
+
+    async def _send(cid):
+        """Ek chat ko message bhejta hai; True return karta hai agar message chala gaya."""
+        async with semaphore:
+            for _ in range(BROADCAST_MAX_RETRIES):
+                try:
+                    await context.bot.send_message(chat_id=cid, text=broadcast_text)
+                    # Slot ek second tak pakad ke rakhein, taaki kul rate BROADCAST_CONCURRENCY msg/s se upar na jaaye
+                    await asyncio.sleep(1)
+                    return True
+                except telegram.error.RetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                except telegram.error.Forbidden:
+                    # Bot ko group se nikal diya gaya ya block kiya gaya, agli baar is chat ko skip karein
+                    inactive_chats.append(cid)
+                    return False
+                except Exception as e:
+                    logger.error(f"Error broadcasting to chat {cid}: {e}")
+                    return False
+            return False
+
+    results = await asyncio.gather(*(_send(cid) for cid in chat_ids))
+    if inactive_chats:
+        await asyncio.to_thread(db_manager.mark_chats_inactive, inactive_chats)
+        _registered_chats.difference_update(inactive_chats) # Bot wapas add hua to agla game inhe phir active karega
+
+    sent = sum(results)
+    await update.message.reply_text(f"Broadcast {sent}/{len(chat_ids)} groups mein bheja gaya. {BROADCAST_AUDIENCE_NOTE}")
+    send_log_message(f"Owner broadcast sent to {sent}/{len(chat_ids)} chats ({len(inactive_chats)} marked inactive): {broadcast_text}")
 
 # --- NEW: Add Game Content Command ---
 async def add_game_content_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -583,7 +906,7 @@ async def add_game_content_command(update: Update, context: ContextTypes.DEFAULT
 
     if not GAME_CHANNEL_ID:
         await update.message.reply_text("GAME_CHANNEL_ID .env mein set nahi hai. Game content add nahi kar sakte.")
-        await send_log_message(context, "Attempt to add game content failed: GAME_CHANNEL_ID not set.")
+        send_log_message("Attempt to add game content failed: GAME_CHANNEL_ID not set.")
         return
     
     if not db_manager.connected: # Add this check
@@ -594,7 +917,7 @@ async def add_game_content_command(update: Update, context: ContextTypes.DEFAULT
     full_message_text = update.message.text
     # Command part ko hata dein: "/addgame "
     # re.split ka upyog karein taaki sirf pehle "/addgame" ko hataaya ja sake
-    parts = re.split(r'^\s*/addgame\s*', full_message_text, 1)
+    parts = ADDGAME_PREFIX_RE.split(full_message_text, 1)
     if len(parts) < 2: # Should not happen if command is correctly `/addgame`
         await update.message.reply_text("Invalid usage. Please use: `/addgame /gametype\\nque. [question]\\nans. [answer]`")
         return
@@ -609,7 +932,7 @@ async def add_game_content_command(update: Update, context: ContextTypes.DEFAULT
 
     # Regular expression ko refine kiya gaya hai taaki newline character escaped ho ya raw string ho
     # और _ जैसे कैरेक्टर Telegram Markdown द्वारा parse न हों
-    match = re.search(r"/(wordchain|guessing|wordcorrection)\\nque\.\s*(.*?)\\nans\.\s*(.*)", game_data_text, re.DOTALL | re.IGNORECASE)
+    match = GAME_DATA_RE.search(game_data_text)
 
     if match:
         game_type = match.group(1).lower()
@@ -624,7 +947,12 @@ async def add_game_content_command(update: Update, context: ContextTypes.DEFAULT
         
         # If the user enters `_`, it should be interpreted literally.
         # Advise user to use `\\n` for newlines in the command
-        
+
+        # Haal hi mein permission error aaya tha to har bulk /addgame par fail hone wala API call na karein
+        if "denied" in _channel_perm_cache:
+            await update.message.reply_text(CHANNEL_PERM_MSG)
+            return
+
         try:
             # Game data ko game channel par post karein
             # Markdown parsing for the message being *sent* to the channel
@@ -638,31 +966,35 @@ async def add_game_content_command(update: Update, context: ContextTypes.DEFAULT
             # Post ki gayi message ki ID ko MongoDB mein save karein
             game_doc = {
                 "game_type": game_type,
-                "question": question, # Sirf reference ke liye, bot ise sidha message se parse karega
-                "answer": answer,     # Sirf reference ke liye
+                "question": question, # Game start par bot yahi se question/answer padhta hai
+                "answer": answer,
                 "game_message_id": posted_message.message_id,
                 "created_at": datetime.now() # Kab add kiya gaya
             }
-            if db_manager.add_game_content(game_doc):
+            if await asyncio.to_thread(db_manager.add_game_content, game_doc):
+                _content_pool.pop(game_type, None) # Naya sawal agle refill mein shamil ho sake
+                if "count" in _content_count_cache:
+                    _content_count_cache["count"] += 1 # DB se dobara ginne ki jagah cached count badhayein
                 await update.message.reply_text(f"Game content successfully added to channel and DB! Message ID: `{posted_message.message_id}`")
-                await send_log_message(context, f"Game content added by owner {update.effective_user.id}: Type={game_type}, Msg ID={posted_message.message_id}")
+                send_log_message(f"Game content added by owner {update.effective_user.id}: Type={game_type}, Msg ID={posted_message.message_id}")
                 
                 # Check for storage limit after adding
                 await check_and_manage_game_content_storage(context)
             else:
                 await update.message.reply_text("Game content add karne mein error aayi (MongoDB issue).")
-                await send_log_message(context, f"Failed to add game content to DB for owner {update.effective_user.id}.")
+                send_log_message(f"Failed to add game content to DB for owner {update.effective_user.id}.")
 
         except telegram.error.BadRequest as e:
             if "not an administrator of the chat" in str(e).lower() or "bot is not a member of the channel" in str(e).lower():
-                await update.message.reply_text("Bot channel mein admin nahi hai ya channel mein nahi hai. Kripya bot ko channel mein 'Post Messages' aur 'Delete Messages' permissions ke saath admin banayein.")
-                await send_log_message(context, f"Bot lacks channel permissions for {GAME_CHANNEL_ID}: {e}")
+                _channel_perm_cache["denied"] = str(e)
+                await update.message.reply_text(CHANNEL_PERM_MSG)
+                send_log_message(f"Bot lacks channel permissions for {GAME_CHANNEL_ID}: {e}")
             else:
                 await update.message.reply_text(f"Telegram API error: {e}")
-                await send_log_message(context, f"Telegram API error while adding game content: {e}")
+                send_log_message(f"Telegram API error while adding game content: {e}")
         except Exception as e:
             await update.message.reply_text(f"An unexpected error occurred: {e}")
-            await send_log_message(context, f"Unexpected error in add_game_content_command: {e}")
+            send_log_message(f"Unexpected error in add_game_content_command: {e}")
     else:
         await update.message.reply_text("Game content format invalid. Kripya sahi format use karein.\n"
                                         "Example: `/addgame /wordchain\\nque. A_ P_ L_\\nans. APPLE`\n"
@@ -680,88 +1012,61 @@ async def post_init_setup(application: telegram.ext.Application):
     इसमें मौजूदा गेम स्टेट्स को रिलोड करना और उनके जॉब्स को री-शेड्यूल करना शामिल है।
     """
     logger.info("Running post-initialization setup...")
-    if db_manager.connected:
-        existing_games_collection = db_manager.get_collection("game_states")
-        if existing_games_collection is not None:
-            for game_data in existing_games_collection.find({}):
-                try:
-                    game_instance = create_game(
-                        game_data["game_type"],
-                        game_data["_id"],
-                        game_data["group_id"],
-                        game_data["question"],
-                        game_data["answer"]
-                    )
-                    if game_instance:
-                        # Load remaining properties
-                        game_instance.players = game_data.get("players", [])
-                        game_instance.current_player_index = game_data.get("current_player_index", 0)
-                        game_instance.status = game_data.get("status", "waiting_for_players")
-                        game_instance.join_window_end_time = game_data.get("join_window_end_time", 0)
-                        game_instance.last_activity_time = game_data.get("last_activity_time", 0)
-                        game_instance.turn_timeout = game_data.get("turn_timeout", 30)
-
-                        if game_instance.game_type == "wordchain":
-                            game_instance.last_word_played = game_data.get("last_word_played")
-                        elif game_instance.game_type == "guessing":
-                            game_instance.guessed_letters = set(game_data.get("guessed_letters", []))
-
-                        active_games[game_instance.group_id] = game_instance
-                        logger.info(f"Loaded active game {game_instance.game_id} in group {game_instance.group_id}.")
-
-                        # Re-schedule jobs if game is still active
-                        current_time = asyncio.get_event_loop().time()
-                        
-                        # Get a context for scheduling jobs
-                        # This is the crucial change for reliable context access in post_init
-                        context_for_jobs = application.updater.dispatcher.bot.get_context() 
-
-                        if game_instance.status == "waiting_for_players":
-                            time_to_run = max(1, int(game_instance.join_window_end_time - current_time))
-                            if time_to_run > 0: # Only schedule if there's time left
-                                application.job_queue.run_once(
-                                    lambda ctx: send_game_join_alerts(ctx, game_instance),
-                                    time_to_run,
-                                    data={"game_id": game_instance.game_id, "chat_id": game_instance.group_id},
-                                    name=f"join_alert_{game_instance.game_id}"
-                                )
-                                logger.info(f"Rescheduled join alert for game {game_instance.game_id} in {time_to_run} seconds.")
-                            else:
-                                logger.info(f"Join window for game {game_instance.game_id} already expired. Attempting to start/cancel.")
-                                # Manually trigger the alert logic to immediately evaluate
-                                application.create_task(send_game_join_alerts(context_for_jobs, game_instance))
-
-
-                        elif game_instance.status == "in_progress":
-                            time_since_last_activity = current_time - game_instance.last_activity_time
-                            time_to_run = max(1, int(game_instance.turn_timeout - time_since_last_activity))
-                            if time_to_run > 0: # Only schedule if there's time left
-                                application.job_queue.run_once(
-                                    lambda ctx: check_turn_timeout(ctx, game_instance.game_id),
-                                    time_to_run,
-                                    data={"game_id": game_instance.game_id, "chat_id": game_instance.group_id},
-                                    name=f"turn_timeout_{game_instance.game_id}"
-                                )
-                                logger.info(f"Rescheduled turn timeout for game {game_instance.game_id} in {time_to_run} seconds.")
-                            else:
-                                logger.info(f"Turn timeout for game {game_instance.game_id} already expired. Attempting to check timeout.")
-                                # Manually trigger the timeout logic to immediately evaluate
-                                application.create_task(check_turn_timeout(context_for_jobs, game_instance.game_id))
-
-                    else:
-                        logger.error(f"Failed to create game instance for loaded data: {game_data}")
-                except Exception as e:
-                    logger.error(f"Error loading game state {game_data.get('_id')}: {e}")
-        else:
-            logger.warning("Could not retrieve 'game_states' collection on startup or collection is None. Skipping game state reload.")
-    else:
+    if not db_manager.connected:
         logger.warning("MongoDB not connected. Skipping existing game states reload.")
+        return
+
+    # Sync pymongo find() ko thread mein chalayein, taaki startup par event loop block na ho
+    for game_data in await asyncio.to_thread(db_manager.get_all_game_states):
+        try:
+            game_instance = rebuild_game_from_dict(game_data)
+            if game_instance is None:
+                logger.error(f"Failed to create game instance for loaded data: {game_data}")
+                continue
+
+            active_games[game_instance.group_id] = game_instance
+            logger.info(f"Loaded active game {game_instance.game_id} in group {game_instance.group_id}.")
+
+            # Re-schedule jobs if game is still active.
+            # Pehla tick turant chalta hai, jo expired join window / turn timeout ko khud handle karta hai.
+            job_data = {"game_id": game_instance.game_id, "chat_id": game_instance.group_id}
+            if game_instance.status == "waiting_for_players":
+                game_instance.join_alert_job = application.job_queue.run_repeating(
+                    send_game_join_alerts,
+                    interval=JOIN_ALERT_INTERVAL,
+                    first=1,
+                    data=job_data,
+                    name=f"join_alert_{game_instance.game_id}"
+                )
+                logger.info(f"Rescheduled join alerts for game {game_instance.game_id}.")
+            elif game_instance.status == "in_progress":
+                game_instance.turn_job = application.job_queue.run_repeating(
+                    check_turn_timeout,
+                    interval=TURN_CHECK_INTERVAL,
+                    first=1,
+                    data=job_data,
+                    name=f"turn_timeout_{game_instance.game_id}"
+                )
+                logger.info(f"Rescheduled turn timeout checks for game {game_instance.game_id}.")
+        except Exception as e:
+            logger.error(f"Error loading game state {game_data.get('_id')}: {e}")
 
 
 # --- Bot Initialization ---
-def run_bot():
-    """Bot ko initialize aur start karta hai."""
-    application = ApplicationBuilder().token(BOT_TOKEN).build()
+def build_application():
+    """Bot application banata hai aur saare handlers register karta hai."""
+    # concurrent_updates: alag groups ke updates ek doosre ke Telegram round-trip ka intezaar nahi karte.
+    # AIORateLimiter saare outgoing API calls ko Telegram ki flood limits ke andar rakhta hai.
+    builder = ApplicationBuilder().token(BOT_TOKEN).concurrent_updates(True).rate_limiter(AIORateLimiter())
+    if WEBHOOK_URL:
+        builder = builder.updater(None) # Webhook mode mein updates Starlette route se aate hain
+    application = builder.build()
+
+    # Game answers sabse zyada aane wale updates hain, isliye unka handler pehle: PTB ek group ke handlers
+    # order mein check karta hai, to answer ko aath CommandHandlers se hokar nahi guzarna padta.
+    # Filter mein ~filters.COMMAND hai, isliye commands aage wale handlers tak hi pahunchte hain.
+    # block=False: handler alag task mein chalta hai, agla update iska intezaar nahi karta (ordering game.lock se)
+    application.add_handler(MessageHandler(filters.ChatType.GROUPS & filters.TEXT & ~filters.COMMAND & ActiveGameFilter(), handle_message, block=False))
 
     # Commands
     application.add_handler(CommandHandler("start", start))
@@ -773,18 +1078,92 @@ def run_bot():
     application.add_handler(CommandHandler("broadcast", broadcast_message))
     application.add_handler(CommandHandler("addgame", add_game_content_command)) # NEW Handler
 
-    # Message and Callback Handlers
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    # Callback Handlers
     application.add_handler(CallbackQueryHandler(button_callback))
-    
-    # Post-initialization setup ko register karein
-    # *** YAHAN BHI BADLAV KIYA GAYA HAI ***
-    application.post_init(post_init_setup) 
 
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Game state ko batch mein MongoDB par likhne wala background job
+    application.job_queue.run_repeating(flush_dirty_games, interval=DIRTY_FLUSH_INTERVAL, name="flush_dirty_games")
+    # Game content pools ko background mein bhara rakhne wala job (pehla run startup par hi)
+    application.job_queue.run_repeating(refill_content_pools, interval=CONTENT_REFILL_INTERVAL, first=1, name="refill_content_pools")
+
+    return application
+
+
+async def main():
+    """
+    Bot aur Uvicorn health server dono ko ek hi event loop par chalata hai.
+    Jab server band ho jaye ya SIGINT/SIGTERM aaye, dono ko saaf tarike se stop karta hai.
+    """
+    application = build_application()
+    app.state.application = application
+    # Health probes har kuch seconds aate hain, unka access log band rakhein
+    health_server = HealthServer(
+        uvicorn.Config(
+            app,
+            host="0.0.0.0",
+            port=int(os.environ.get("PORT", 8080)),
+            log_level="warning",
+            access_log=False,
+        )
+    )
 
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # Python 3.12+: naye tasks pehle await tak turant chalte hain, jo tasks bina suspend hue khatm ho jaate hain
+    # (cache hits, chhote handlers) unhe loop par schedule karne ka kharcha nahi lagta. Purane Python par skip.
+    if hasattr(asyncio, "eager_task_factory"):
+        loop.set_task_factory(asyncio.eager_task_factory)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows event loops add_signal_handler support nahi karte; wahan plain signal handler se loop ko batayein
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop_event.set))
 
-# --- Flask Server aur Bot ko run karna ---
+    try:
+        async with application:
+            # run_polling() khud post_init chalata hai; manual lifecycle mein ise yahan call karein
+            await post_init_setup(application)
+            await application.start()
+            log_task = asyncio.create_task(_log_channel_worker(application.bot), name="log_channel_worker")
+            if WEBHOOK_URL:
+                await application.bot.set_webhook(
+                    url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+                    allowed_updates=ALLOWED_UPDATES,
+                    secret_token=WEBHOOK_SECRET
+                )
+                logger.info(f"Webhook set to {WEBHOOK_URL}{WEBHOOK_PATH}. Health server starting on the same event loop.")
+            else:
+                await application.updater.start_polling(allowed_updates=ALLOWED_UPDATES)
+                logger.info("Bot polling started. Health server starting on the same event loop.")
+
+            server_task = asyncio.create_task(health_server.serve(), name="uvicorn_server")
+            stop_task = asyncio.create_task(stop_event.wait(), name="shutdown_signal")
+            try:
+                await asyncio.wait({server_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+                if server_task.done() and not server_task.cancelled() and server_task.exception():
+                    logger.error(f"Health server stopped with error: {server_task.exception()}. Shutting down.")
+            finally:
+                stop_task.cancel()
+                if not server_task.done():
+                    health_server.should_exit = True
+                    await server_task
+                logger.info("Shutting down bot...")
+                if application.updater is not None:
+                    await application.updater.stop()
+                await application.stop()
+                # Bache hue log messages ko thoda waqt dein, phir worker band karein
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(_log_channel_queue.join(), timeout=LOG_DRAIN_TIMEOUT)
+                log_task.cancel()
+    finally:
+        # Application shutdown ke baad hi DB band karein, taaki koi pending handler adhoora na rahe.
+        # Jo state abhi flush nahi hui use pehle save karein.
+        await flush_dirty_games()
+        await asyncio.to_thread(db_manager.close) # Pool band karna bhi blocking hai
+
+
+# --- Health Server aur Bot ko run karna ---
 if __name__ == "__main__":
     if not BOT_TOKEN or not MONGO_URI:
         logger.error("Essential environment variables (BOT_TOKEN, MONGO_URI) are not set. Exiting.")
@@ -794,14 +1173,23 @@ if __name__ == "__main__":
         logger.error("Essential channel/owner IDs (GAME_CHANNEL_ID, LOG_CHANNEL_ID, OWNER_USER_ID) are not set correctly. Please check .env file.")
         exit(1)
 
+    # Channel/group IDs hamesha negative hote hain (e.g. -100...), positive ID user ki hoti hai
+    if GAME_CHANNEL_ID > 0 or LOG_CHANNEL_ID > 0:
+        logger.error("GAME_CHANNEL_ID and LOG_CHANNEL_ID must be channel IDs (negative, e.g. -100...). Please check .env file.")
+        exit(1)
+
+    if WEBHOOK_URL and not WEBHOOK_SECRET:
+        logger.error("WEBHOOK_URL is set but WEBHOOK_SECRET is not. Refusing to accept unauthenticated webhook updates. Exiting.")
+        exit(1)
+
     # MongoDB connection check yahan pehle karein
+    db_manager.connect()
     if not db_manager.connected:
         logger.error("Failed to connect to MongoDB. Exiting.")
         exit(1)
-    
-    flask_thread = Thread(target=lambda: app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080))))
-    flask_thread.start()
-    logger.info("Flask server started in a separate thread.")
-    
+
     # Run the bot only if MongoDB connection is successful
-    run_bot()
+    # Default selector loop ki jagah libuv-based uvloop use karein (agar installed hai)
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(main())